@@ -201,6 +201,31 @@ pub fn query_fragment_to_hps(
         .collect::<Vec<_>>()
 }
 
+/// Shift an indel at (`p0`, `p1`) to the left while the shifted indel gives the same sequence.
+/// `ref_len` / `tgt_len` are the number of reference / target bases in the indel
+/// (`ref_len` is 0 for an insertion, `tgt_len` is 0 for a deletion).
+/// The shift stops at position 1, and indels that run past the end of a sequence are not shifted.
+pub fn leftalign_indel(
+    rs: &[u8],
+    cs: &[u8],
+    mut p0: usize,
+    mut p1: usize,
+    ref_len: usize,
+    tgt_len: usize,
+) -> (usize, usize) {
+    while p0 >= 2
+        && p1 >= 2
+        && p0 + ref_len <= rs.len()
+        && p1 + tgt_len <= cs.len()
+        && rs[p0 + ref_len - 1] == cs[p1 + tgt_len - 1]
+        && rs[p0 - 2] == cs[p1 - 2]
+    {
+        p0 -= 1;
+        p1 -= 1;
+    }
+    (p0, p1)
+}
+
 #[test]
 
 fn sparse_aln_test() {
@@ -227,3 +252,34 @@ fn sparse_aln_test() {
     let out = sparse_aln(&mut hp, 8, 0.5_f32);
     out.iter().for_each(|(s, v)| println!("{} {}", s, v.len()));
 }
+
+#[test]
+fn leftalign_indel_test() {
+    // an inserted T in a T run moves to the start of the run
+    assert_eq!(
+        leftalign_indel(b"GGCATTTAGG", b"GGCATTTTAGG", 7, 7, 0, 1),
+        (4, 4)
+    );
+    // a deleted T in a T run moves to the start of the run
+    assert_eq!(
+        leftalign_indel(b"GGCATTTTAGG", b"GGCATTTAGG", 7, 7, 1, 0),
+        (4, 4)
+    );
+    // a CA inserted in a CA repeat
+    assert_eq!(
+        leftalign_indel(b"GGCACACATT", b"GGCACACACATT", 8, 8, 0, 2),
+        (2, 2)
+    );
+    // no shift when the bases before the indel differ
+    assert_eq!(
+        leftalign_indel(b"GGCAGTAGG", b"GGCAGCTAGG", 5, 5, 0, 1),
+        (5, 5)
+    );
+    // a run at the start of the sequence stops at position 1, never wraps around
+    assert_eq!(leftalign_indel(b"TTTTAC", b"TTTTTAC", 4, 4, 0, 1), (1, 1));
+    assert_eq!(leftalign_indel(b"TTTTTAC", b"TTTTAC", 4, 4, 1, 0), (1, 1));
+    assert_eq!(leftalign_indel(b"ACGT", b"ACGGT", 1, 1, 0, 1), (1, 1));
+    // indels running past the end of a sequence are left in place
+    assert_eq!(leftalign_indel(b"ACGTA", b"ACG", 4, 3, 2, 0), (4, 3));
+    assert_eq!(leftalign_indel(b"ACG", b"ACGTA", 3, 4, 0, 2), (3, 4));
+}
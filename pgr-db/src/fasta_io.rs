@@ -23,24 +23,103 @@ pub struct FastaReader<R> {
     keep_source: bool,
 }
 
+const fn build_complement_table() -> [u8; 256] {
+    let mut table = [0_u8; 256];
+    let mut i = 0;
+    while i < 256 {
+        table[i] = i as u8;
+        i += 1;
+    }
+    let fwd = b"ACGTNnacgt";
+    let rev = b"TGCANntgca";
+    let mut i = 0;
+    while i < fwd.len() {
+        table[fwd[i] as usize] = rev[i];
+        i += 1;
+    }
+    table
+}
+
+/// ASCII complement lookup table, bytes other than `ACGTNacgtn` map to themselves
+pub const COMPLEMENT: [u8; 256] = build_complement_table();
+
 pub fn reverse_complement(seq: &[u8]) -> Vec<u8> {
-    let mut rev_seq = Vec::new();
-    for b in seq.iter().rev() {
-        match b {
-            b'A' => rev_seq.push(b'T'),
-            b'C' => rev_seq.push(b'G'),
-            b'G' => rev_seq.push(b'C'),
-            b'T' => rev_seq.push(b'A'),
-            b'a' => rev_seq.push(b't'),
-            b'c' => rev_seq.push(b'g'),
-            b'g' => rev_seq.push(b'c'),
-            b't' => rev_seq.push(b'a'),
-            b'N' => rev_seq.push(b'N'),
-            b'n' => rev_seq.push(b'n'),
-            _ => rev_seq.push(*b),
+    seq.iter().rev().map(|&b| COMPLEMENT[b as usize]).collect()
+}
+
+#[inline]
+fn reverse_complement_scalar(seq: &[u8], out: &mut [u8]) {
+    out.iter_mut()
+        .zip(seq.iter().rev())
+        .for_each(|(o, &b)| *o = COMPLEMENT[b as usize]);
+}
+
+/// AVX2 kernel: for `ACGTNacgtn` the complement is `b ^ mask[b & 0x0F]`
+/// (A/T -> 0x15, C/G -> 0x04, N -> 0), so one nibble shuffle complements 32 bases.
+/// A second shuffle plus a lane swap reverses the block. Blocks containing other
+/// bytes and the tail go through the scalar table.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "avx2")]
+unsafe fn reverse_complement_avx2(seq: &[u8], out: &mut [u8]) {
+    use std::arch::x86_64::*;
+    let n = seq.len();
+    #[rustfmt::skip]
+    let xor_lut = _mm256_setr_epi8(
+        0, 0x15, 0, 0x04, 0x15, 0, 0, 0x04, 0, 0, 0, 0, 0, 0, 0, 0,
+        0, 0x15, 0, 0x04, 0x15, 0, 0, 0x04, 0, 0, 0, 0, 0, 0, 0, 0,
+    );
+    #[rustfmt::skip]
+    let rev_idx = _mm256_setr_epi8(
+        15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0,
+        15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0,
+    );
+    let lo_nibble = _mm256_set1_epi8(0x0F);
+    let upper_case = _mm256_set1_epi8(0xDF_u8 as i8);
+    let base_a = _mm256_set1_epi8(b'A' as i8);
+    let base_c = _mm256_set1_epi8(b'C' as i8);
+    let base_g = _mm256_set1_epi8(b'G' as i8);
+    let base_t = _mm256_set1_epi8(b'T' as i8);
+    let base_n = _mm256_set1_epi8(b'N' as i8);
+
+    let mut i = 0;
+    while i + 32 <= n {
+        let dst = n - 32 - i;
+        let v = _mm256_loadu_si256(seq.as_ptr().add(i) as *const __m256i);
+        let u = _mm256_and_si256(v, upper_case);
+        let valid = _mm256_or_si256(
+            _mm256_or_si256(_mm256_cmpeq_epi8(u, base_a), _mm256_cmpeq_epi8(u, base_c)),
+            _mm256_or_si256(
+                _mm256_or_si256(_mm256_cmpeq_epi8(u, base_g), _mm256_cmpeq_epi8(u, base_t)),
+                _mm256_cmpeq_epi8(u, base_n),
+            ),
+        );
+        if _mm256_movemask_epi8(valid) == -1 {
+            let mask = _mm256_shuffle_epi8(xor_lut, _mm256_and_si256(v, lo_nibble));
+            let c = _mm256_xor_si256(v, mask);
+            let r = _mm256_shuffle_epi8(c, rev_idx);
+            let r = _mm256_permute2x128_si256(r, r, 0x01);
+            _mm256_storeu_si256(out.as_mut_ptr().add(dst) as *mut __m256i, r);
+        } else {
+            reverse_complement_scalar(&seq[i..i + 32], &mut out[dst..dst + 32]);
         }
+        i += 32;
     }
-    rev_seq
+    reverse_complement_scalar(&seq[i..], &mut out[..n - i]);
+}
+
+/// Write the reverse complement of `seq` into `out`, which must have the same length.
+/// Uses the AVX2 kernel when the CPU supports it.
+#[inline]
+pub fn reverse_complement_into(seq: &[u8], out: &mut [u8]) {
+    assert_eq!(seq.len(), out.len());
+    #[cfg(target_arch = "x86_64")]
+    {
+        if is_x86_feature_detected!("avx2") {
+            unsafe { reverse_complement_avx2(seq, out) };
+            return;
+        }
+    }
+    reverse_complement_scalar(seq, out);
 }
 
 impl<R: BufRead> FastaReader<R> {
@@ -410,3 +489,41 @@ pub fn build(seq_list_file: &String, out_prefix: &String) -> Result<usize, io::E
     log::info!("average read length: {}", start as f32 / seq_id as f32);
     Ok(start)
 }
+
+#[cfg(test)]
+mod test {
+    use super::*;
+
+    #[test]
+    fn reverse_complement_into_matches_scalar() {
+        // mostly bases, so most 32-base blocks take the SIMD path, plus some other bytes
+        let alphabet = b"ACGTNacgtnACGTACGTacgtacgt";
+        let mut state = 0x2545_f491_4f6c_dd1d_u64;
+        let mut next = || {
+            state ^= state << 13;
+            state ^= state >> 7;
+            state ^= state << 17;
+            state
+        };
+        for len in 0..100 {
+            for round in 0..20 {
+                let seq = (0..len)
+                    .map(|_| {
+                        let r = next();
+                        if round % 2 == 1 && r % 37 == 0 {
+                            (r >> 32) as u8
+                        } else {
+                            alphabet[(r >> 16) as usize % alphabet.len()]
+                        }
+                    })
+                    .collect::<Vec<u8>>();
+                let mut out = vec![0_u8; len];
+                reverse_complement_into(&seq, &mut out);
+                assert_eq!(out, reverse_complement(&seq), "seq: {:?}", seq);
+            }
+        }
+        let mut out = vec![0_u8; 40];
+        reverse_complement_into(&[b'X'; 40], &mut out);
+        assert_eq!(out, vec![b'X'; 40]);
+    }
+}
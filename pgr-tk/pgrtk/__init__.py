@@ -28,14 +28,15 @@ This shows a simple example to query the pangenome database::
 """
 
 import pgrtk
+import re
 import numpy as np
+from collections import defaultdict
+from itertools import chain
+from operator import itemgetter
 from .pgrtk import *
 
 __version__ = pgrtk.pgr_lib_version()
 
-byte_rc_map = dict(zip([ord(c) for c in "ACGTNnacgt"],
-                   [ord(c) for c in "TGCANntgca"]))
-
 
 def rc_byte_seq(seq):
     """ Reverse complement a sequence as a list of bytes.
@@ -51,10 +52,10 @@ def rc_byte_seq(seq):
         the list of bytes of the reverse complement DNA sequence
 
     """
-    seq = [byte_rc_map[_] for _ in seq[::-1]]
-    return seq
+    return list(rc_bytes(bytes(seq)))
+
 
-def rc_u8_seq(seg):
+def rc_u8_seq(seq):
     """ Reverse complement a sequence as a list of bytes (unsigned 8bit interger).
 
     Parameters
@@ -68,11 +69,7 @@ def rc_u8_seq(seg):
         the list of bytes of the reverse complement DNA sequence
 
     """
-    seq = [byte_rc_map[_] for _ in seq[::-1]]
-    return seq
-
-
-rc_map = dict(zip("ACGTNnactg", "TGCANntgca"))
+    return rc_byte_seq(seq)
 
 
 def rc(seq):
@@ -89,8 +86,7 @@ def rc(seq):
         the reverse complement DNA sequence as a Python String
 
     """
-    seq = "".join([rc_map[_] for _ in seq[::-1]])
-    return seq
+    return rc_bytes(seq.encode("ascii")).decode("ascii")
 
 
 def string_to_u8(s):
@@ -186,31 +182,24 @@ def query_sdb(seq_index_db, query_seq,
         max_target_count,
         max_aln_span)
 
-    sid_to_alns = {}
+    sid_to_alns = defaultdict(list)
     for (sid, alns) in r:
-        aln_lens = []
-        f_count = 0
-        r_count = 0
+        o_count = 0  # (forward hits - reverse hits) seen so far for the target
         for s, aln in alns:
             if len(aln) > 2:
-                aln_lens.append(len(aln))
-                sid_to_alns.setdefault(sid, [])
-                for hp in aln:
-                    if hp[0][2] == hp[1][2]:
-                        f_count += 1
-                    else:
-                        r_count += 1
-                orientation = 0 if f_count > r_count else 1
-                sid_to_alns[sid].append((aln, orientation))
-
-    aln_range = {}
+                bgn, end = aln[0][1][0], aln[0][1][1]
+                for q_hit, t_hit in aln:
+                    if t_hit[0] < bgn:
+                        bgn = t_hit[0]
+                    if t_hit[1] > end:
+                        end = t_hit[1]
+                    o_count += 1 if q_hit[2] == t_hit[2] else -1
+                orientation = 0 if o_count > 0 else 1
+                sid_to_alns[sid].append((aln, orientation, bgn, end))
+
+    aln_range = defaultdict(list)
     for sid, alns in sid_to_alns.items():
-        for aln, orientation in alns:
-            target_coor = [(_[1][0], _[1][1]) for _ in aln]
-            target_coor.sort()
-            bgn = min(target_coor[0])
-            end = max(target_coor[-1])
-            aln_range.setdefault(sid, [])
+        for aln, orientation, bgn, end in alns:
             aln_range[sid].append((bgn, end, end-bgn, orientation, aln))
 
     if merge_range_tol > 0:
@@ -218,7 +207,7 @@ def query_sdb(seq_index_db, query_seq,
             aln_range[sid] = merge_regions(
                 rgns, tol=merge_range_tol)
 
-    return aln_range
+    return dict(aln_range)
 
 
 def map_intervals_in_sdb(seq_index_db, interval, query_seq,
@@ -281,50 +270,41 @@ def merge_regions(rgns, tol=1000):
     """
     # rgns is a list of (bgn, end, len, orientation)
 
-    rgns.sort()
-    frgns = [r for r in rgns if r[3] == 0]
-    rrgns = [r for r in rgns if r[3] == 1]
-    fwd_rgns = []
-    last = None
-    for r in frgns:
-        r = list(r)
-        if last is None:
-            last = r[1]
-            fwd_rgns.append(r)
-            continue
-
-        if r[1] < fwd_rgns[-1][1]:
-            continue
-
-        if r[0] - last < tol:  # merge
-            fwd_rgns[-1][1] = r[1]
-            fwd_rgns[-1][2] += r[2]
-            fwd_rgns[-1][4] += r[4]
-        else:
-            fwd_rgns.append(r)
-        last = fwd_rgns[-1][1]
-
-    rev_rgns = []
-    last = None
-    for r in rrgns:
+    def merged(r, end, length, extra):
         r = list(r)
-        if last is None:
-            last = r[1]
-            rev_rgns.append(r)
-            continue
+        r[1] = end
+        r[2] = length
+        if len(extra) > 1:  # a new list, so the caller's hit lists are not extended
+            r[4] = list(chain.from_iterable(extra))
+        return r
 
-        if r[1] < rev_rgns[-1][1]:
+    # one pass over the regions sorted by orientation, then by (bgn, end, len, ...)
+    rgns.sort()
+    rgns.sort(key=itemgetter(3))
+    merged_rgns = []
+    cur = None
+    for r in rgns:
+        orientation = r[3]
+        if orientation != 0 and orientation != 1:
             continue
+        if cur is not None and orientation == cur[3]:
+            if r[1] < cur_end:
+                continue
+            if r[0] - cur_end < tol:  # merge
+                cur_end = r[1]
+                cur_len += r[2]
+                cur_extra.append(r[4])
+                continue
+        if cur is not None:
+            merged_rgns.append(merged(cur, cur_end, cur_len, cur_extra))
+        cur = r
+        cur_end = r[1]
+        cur_len = r[2]
+        cur_extra = [r[4]]
 
-        if r[0] - last < tol:  # merge
-            rev_rgns[-1][1] = r[1]
-            rev_rgns[-1][2] += r[2]
-            rev_rgns[-1][4] += r[4]
-        else:
-            rev_rgns.append(r)
-
-        last = rev_rgns[-1][1]
-    return fwd_rgns + rev_rgns
+    if cur is not None:
+        merged_rgns.append(merged(cur, cur_end, cur_len, cur_extra))
+    return merged_rgns
 
 
 def get_variant_calls(aln_segs, ref_bgn, ctg_bgn, rs0, cs0, strand):
@@ -380,6 +360,8 @@ def get_variant_calls(aln_segs, ref_bgn, ctg_bgn, rs0, cs0, strand):
         calls in the form of a dictionary mapping from (target_location, strand) to 
         a variant call record.
     """
+    rs0_u8 = rs0.encode("ascii") if isinstance(rs0, str) else bytes(rs0)
+    cs0_u8 = cs0.encode("ascii") if isinstance(cs0, str) else bytes(cs0)
     variant_calls = {}
     for s in aln_segs:
         ref_id = s.ref_loc[0]
@@ -390,31 +372,16 @@ def get_variant_calls(aln_segs, ref_bgn, ctg_bgn, rs0, cs0, strand):
                 alt_bases = cs0[s.tgt_loc[1]:s.tgt_loc[1]+s.tgt_loc[2]]
 
             if s.t == ord('I'):
-                p0 = s.ref_loc[1]
-                p1 = s.tgt_loc[1]
-
-                while 1:
-                    if rs0[p0-1] == cs0[p1+s.tgt_loc[2]-1] and rs0[p0-2] == cs0[p1-2]:
-                        p0 = p0 - 1
-                        p1 = p1 - 1
-                    else:
-                        break
+                p0, p1 = leftalign_indel(rs0_u8, cs0_u8, s.ref_loc[1], s.tgt_loc[1],
+                                         0, s.tgt_loc[2])
 
                 key = (ref_id, p0+ref_bgn)
                 ref_bases = rs0[p0-1:p0+s.ref_loc[2]]
                 alt_bases = cs0[p1-1:p1+s.tgt_loc[2]]
 
             if s.t == ord('D'):
-
-                p0 = s.ref_loc[1]
-                p1 = s.tgt_loc[1]
-
-                while 1 and p0 > 0 and p1 > 0:
-                    if rs0[p0+s.ref_loc[2]-1] == cs0[p1-1] and rs0[p0-2] == cs0[p1-2]:
-                        p0 = p0 - 1
-                        p1 = p1 - 1
-                    else:
-                        break
+                p0, p1 = leftalign_indel(rs0_u8, cs0_u8, s.ref_loc[1], s.tgt_loc[1],
+                                         s.ref_loc[2], 0)
 
                 key = (ref_id, p0+ref_bgn)
                 ref_bases = rs0[p0-1:p0+s.ref_loc[2]]
@@ -445,42 +412,23 @@ def output_variants_to_vcf_records(variant_calls, ref_name):
     list
         list of VCF records
     """
-    keys = sorted(list(variant_calls.keys()))
     vcf_recs = []
-    for k in keys:
-        v = variant_calls[k]
-        ref_id = k[0]
-        gt_set = set()
-        gt = ["."]
-        gt_idx = 0
-        variants = []
-        for kk in v:
-            gt_idx += 1
-            variants.append((gt_idx, v[kk][:3], ref_id))
-
-        count = {}
-        for v in variants:
-            count.setdefault(v[0], [])
-            count[v[0]].append(v[1])
-
-        ht = [(str(x[2]), str(x[0])) for x in variants]
-        ht.sort()
-        ht = list(zip(*ht))
-
-        for kk in sorted(count.keys()):
-            ref_base = count[kk][0][1]
-            alt_base = count[kk][0][2]
-            # print(count)
+    for k, v in sorted(variant_calls.items()):
+        for call in v.values():
+            ref_base, alt_base = call[1], call[2]
             if ref_base == alt_base:
                 continue
 
-            vcf_recs.append((ref_name,  "{}".format(k[1]), ".", ref_base, alt_base,
+            vcf_recs.append((ref_name, str(k[1]), ".", ref_base, alt_base,
                              "30", ".", ".", "GT:AD", "./1:0,1:"))
 
     return vcf_recs
 
 
-def compute_graph_diffusion_entropy(gfa_fn, max_nodes = 6000):
+_GFA_SC_TAG = re.compile(r"(?:^|\t)SC:[^:\t]*:(-?\d+)")
+
+
+def compute_graph_diffusion_entropy(gfa_fn, max_nodes = 6000, use_gpu = False):
     """ Give a GFA file name, compute an entropy by a simple diffusion model on the grap
         and generate the list of the final diffusion weight for each node
     
@@ -489,6 +437,12 @@ def compute_graph_diffusion_entropy(gfa_fn, max_nodes = 6000):
     gfa_fn : string
         a gfa filename
 
+    max_nodes : int
+        return ``None`` if the graph has more than ``max_nodes`` nodes
+
+    use_gpu : bool
+        run the diffusion on a GPU in float32, this requires ``cupy``
+
     Returns
     -------
     tuple
@@ -496,44 +450,69 @@ def compute_graph_diffusion_entropy(gfa_fn, max_nodes = 6000):
 
         list_of_diffusion_weight = ``[(node_id, weight), ...]`` 
     """
-    adj_list = {}
+    from scipy import sparse
+
+    edges = {}
 
+    # only the "L" lines are split, the (long) segment lines are skipped without copying
     with open(gfa_fn) as f:
         for r in f:
-            r = r.strip().split("\t")
-            if r[0] != "L":
+            if not r.startswith("L\t"):
                 continue
+            r = r.rstrip().split("\t", 6)
             n1 = int(r[1])
             n2 = int(r[3])
-            weight = None
-            for f in r[6:]:
-                f = f.split(":")
-                if f[0] == "SC":
-                    weight = int(f[2])
-            if weight == None:
-                weight = 1
-            adj_list.setdefault( n1, [] )
-            adj_list[ n1 ]. append((n2, weight))
-            adj_list.setdefault( n2, [] )
-            adj_list[ n2 ]. append((n1, weight))
-    
-    n_node = len(adj_list)
+            sc = _GFA_SC_TAG.findall(r[6]) if len(r) > 6 else []
+            weight = int(sc[-1]) if len(sc) > 0 else 1
+            edges[(n1, n2)] = weight
+            edges[(n2, n1)] = weight
+
+    nodes = np.array(list(edges.keys()), dtype=np.int32).reshape(-1, 2)
+    weights = np.fromiter(edges.values(), dtype=np.float32, count=len(edges))
+    n_node = len(np.unique(nodes[:, 0]))
     if n_node > max_nodes:
         ## TODO: proper message to handle big graph
         return None
 
-    adj_matrix = np.zeros( (n_node, n_node), dtype=np.float32 )
-    for v, ws in adj_list.items():
-        for w, weight in ws:
-            adj_matrix[v][w] = weight
-            
-    n_adj_matrix = adj_matrix / np.sum(adj_matrix, axis=1)
-    weights = []
-    one = np.ones(n_node, dtype=np.float32)/n_node
-    yy = one.copy()
-
+    adj_matrix = sparse.csr_matrix((weights, (nodes[:, 0], nodes[:, 1])),
+                                   shape=(n_node, n_node), dtype=np.float32)
+
+    # scale column j by the total weight of node j, so the diffusion conserves the total weight;
+    # done on the CSR values in place, without a sparse matrix product or a format conversion
+    node_weights = np.asarray(adj_matrix.sum(axis=1)).ravel()
+    inv_node_weights = np.divide(1.0, node_weights, out=np.zeros_like(node_weights),
+                                 where=node_weights > 0)
+    n_adj_matrix = adj_matrix
+    n_adj_matrix.data *= inv_node_weights[n_adj_matrix.indices]
+
+    if use_gpu:
+        # float64 SpMV is slow on most GPUs, so the GPU iteration stays in float32
+        # and stops at a change float32 can resolve
+        import cupy as cp
+        from cupyx.scipy.sparse import csr_matrix as cp_csr_matrix
+        n_adj_matrix = cp_csr_matrix(n_adj_matrix)
+        yy = cp.ones(n_node, dtype=cp.float32)/n_node
+        tol = 1e-6
+    else:
+        # SciPy upcasts a float32 matrix on every product with a float64 vector,
+        # so convert it once for the float64 accumulation
+        n_adj_matrix = n_adj_matrix.astype(np.float64)
+        yy = np.ones(n_node, dtype=np.float64)/n_node
+        tol = 1e-9
+
+    # iterate until the weights converge to the stationary distribution,
+    # checking the change of a single step every 8 steps;
+    # periodic graphs (e.g. bipartite graphs) stop after `n_node` steps
     for i in range(n_node):
-        yy = np.inner(n_adj_matrix, yy)
+        check = i % 8 == 7
+        if check:
+            yy_prev = yy
+        yy = n_adj_matrix @ yy
+        if check and abs(yy - yy_prev).sum() < tol:
+            break
+
+    if use_gpu:
+        yy = cp.asnumpy(yy).astype(np.float64)
 
     entropy = -np.sum(yy * np.log2(yy))
     weight_list = list(enumerate(yy*n_node))
@@ -627,20 +606,16 @@ def get_principle_bundle_bed_file_for_query(seqs, w=64, k=56, r=4, min_span=32,
     
     principal_bundles, sid_smps = sdb.get_principal_bundle_decomposition(min_cov, min_branch_length)
     
+    # `sid_smps` is a list of (sid, smps) pairs, `sdb.seq_info` is already a new dict for each access
     sid_smps = dict(sid_smps)
-    seq_info = sdb.seq_info.copy()
-    sinfo = list(seq_info.items())
-    sinfo.sort(key=lambda x: x[1][0])
+    sinfo = sorted(sdb.seq_info.items(), key=lambda x: x[1][0])
 
     bundle_layout = []
     for sid, data in sinfo:
 
         ctg, _, _ = data
 
-        ctg_items = ctg.split("_")
-        ctg_bgn = int(ctg_items[-3])
-        ctg_end = int(ctg_items[-2])
-        ctg_dir = int(ctg_items[-1])
+        ctg_bgn, ctg_end, ctg_dir = map(int, ctg.rsplit("_", 3)[-3:])
         #assert(ctg_dir==0)
 
         smps = sid_smps[sid]
@@ -649,12 +624,14 @@ def get_principle_bundle_bed_file_for_query(seqs, w=64, k=56, r=4, min_span=32,
 
         smp_partitions.reverse()
         for p in smp_partitions:
-            b = p[0][0][2]
-            e = p[-1][0][3] + k
-            bid = p[0][1]
-
-            direction = p[0][2]
-            bundle_layout.append( (ctg, ctg_bgn+b, ctg_bgn+e, "{}:{}:{}:{}".format(bid, direction, p[0][3], p[-1][3])) )
+            p0 = p[0]
+            pl = p[-1]
+            b = p0[0][2]
+            e = pl[0][3] + k
+            bid = p0[1]
+
+            direction = p0[2]
+            bundle_layout.append( (ctg, ctg_bgn+b, ctg_bgn+e, f"{bid}:{direction}:{p0[3]}:{pl[3]}") )
             
     return bundle_layout
 
@@ -12,6 +12,7 @@ use pgr_db::agc_io;
 use pgr_db::fasta_io;
 use pyo3::exceptions;
 use pyo3::prelude::*;
+use pyo3::types::PyBytes;
 use pyo3::wrap_pyfunction;
 use pyo3::Python;
 use rayon::prelude::*;
@@ -1675,6 +1676,66 @@ fn get_shmmr_dots(
     (x, y)
 }
 
+/// Reverse complement a DNA sequence
+///
+/// Parameters
+/// ----------
+/// seq : bytes
+///     the ascii code of the DNA sequence
+///
+/// Returns
+/// -------
+/// bytes
+///     the reverse complement of the DNA sequence
+///
+#[pyfunction(signature = (seq))]
+pub fn rc_bytes(py: Python, seq: &[u8]) -> PyResult<Py<PyBytes>> {
+    let out = PyBytes::new_with(py, seq.len(), |buf| {
+        fasta_io::reverse_complement_into(seq, buf);
+        Ok(())
+    })?;
+    Ok(out.into())
+}
+
+/// Shift an indel to the left while the shifted indel gives the same sequence
+///
+/// Parameters
+/// ----------
+/// rs : bytes
+///     the reference sequence
+///
+/// cs : bytes
+///     the contig sequence
+///
+/// p0 : int
+///     the indel position in the reference sequence
+///
+/// p1 : int
+///     the indel position in the contig sequence
+///
+/// ref_len : int
+///     the number of reference bases in the indel, ``0`` for an insertion
+///
+/// tgt_len : int
+///     the number of contig bases in the indel, ``0`` for a deletion
+///
+/// Returns
+/// -------
+/// tuple
+///     the shifted positions ``(p0, p1)``
+///
+#[pyfunction(signature = (rs, cs, p0, p1, ref_len, tgt_len))]
+pub fn leftalign_indel(
+    rs: &[u8],
+    cs: &[u8],
+    p0: usize,
+    p1: usize,
+    ref_len: usize,
+    tgt_len: usize,
+) -> (usize, usize) {
+    aln::leftalign_indel(rs, cs, p0, p1, ref_len, tgt_len)
+}
+
 /// A wrapper class to represent alignment segment for python
 ///
 /// This wraps the Rust struct ``seq2variants::AlnSegment`` mapping
@@ -2047,6 +2108,8 @@ fn pgrtk(_: Python, m: &PyModule) -> PyResult<()> {
     //m.add_function(wrap_pyfunction!(get_aln_map, m)?)?;
     m.add_function(wrap_pyfunction!(pgr_lib_version, m)?)?;
     m.add_function(wrap_pyfunction!(get_shmmr_pairs_from_seq, m)?)?;
+    m.add_function(wrap_pyfunction!(rc_bytes, m)?)?;
+    m.add_function(wrap_pyfunction!(leftalign_indel, m)?)?;
     m.add_function(wrap_pyfunction!(naive_dbg_consensus, m)?)?;
     m.add_function(wrap_pyfunction!(shmmr_dbg_consensus, m)?)?;
     m.add_function(wrap_pyfunction!(guided_shmmr_dbg_consensus, m)?)?;